@@ -1,20 +1,44 @@
 import streamlit as st
 from google.cloud import bigquery
+from google.cloud import bigquery_storage
 from google.oauth2 import service_account
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
+import pyarrow as pa
 import json
 from datetime import date, datetime
 import io
+import time
+
+# Copy-on-Write makes slices safe to derive from without defensive .copy() calls (always on from pandas 3)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.options.mode.copy_on_write = True
 
 # Set Streamlit page to wide mode
 st.set_page_config(layout="wide")
 
-# Fetch credentials from Streamlit secrets
-try:
+@st.cache_resource
+def get_bq_credentials():
+    """Parses the service account credentials from Streamlit secrets once per server process."""
     credentials_json = st.secrets["bigquery"]["credentials"]
-    credentials = service_account.Credentials.from_service_account_info(json.loads(credentials_json))
-    client = bigquery.Client(credentials=credentials, project=credentials.project_id)
+    return service_account.Credentials.from_service_account_info(json.loads(credentials_json))
+
+@st.cache_resource
+def get_bq_client():
+    """Returns the shared BigQuery client."""
+    credentials = get_bq_credentials()
+    return bigquery.Client(credentials=credentials, project=credentials.project_id)
+
+@st.cache_resource
+def get_bqstorage_client():
+    """Returns the shared BigQuery Storage read client."""
+    return bigquery_storage.BigQueryReadClient(credentials=get_bq_credentials())
+
+# Fetch credentials from Streamlit secrets (clients are cached across reruns and sessions)
+try:
+    client = get_bq_client()
+    bqstorage_client = get_bqstorage_client()
 except Exception as e:
     st.error(f"Error loading BigQuery credentials: {e}")
     st.stop()
@@ -22,22 +46,283 @@ except Exception as e:
 # Define the full table ID
 table_id = "alfred-analytics-406004.analytics_alfred.finpay_topup_joined"
 
-# BigQuery query to fetch all data
-query = f"""
-SELECT *
+# Columns the dashboard relies on, and the subset driving the cascading sidebar filters
+required_columns = ['TransactionDate', 'Amount', 'TransactionType', 'Nama', 'ClusterID', 'Sender']
+filter_columns = ['TransactionType', 'ClusterID', 'Sender', 'Nama']
+
+# Labels used for missing values in the filter columns
+missing_placeholders = {
+    'TransactionType': "tanpa_tipe",
+    'ClusterID': "tanpa_cluster",
+    'Sender': "tanpa_sender",
+    'Nama': "tanpa_nama",
+}
+
+# Columns shown in the filtered table, including the computed NetChange and RunningSaldo
+columns_to_display = [
+    'Remarks', 'Receiver', 'Currency', 'Amount', 'Sender', 'TransactionType',
+    'ClusterID', 'TransactionDate', 'Nama_Manager_Cluster', 'TAP',
+    'Kota_Kabupaten', 'RS_Number', 'Nama_SF', 'nama_outlet', 'SF_Code_2',
+    'SF_Code_1', 'Region', 'cluster_code', 'end_date', 'id_outlet',
+    'start_date', 'PJP_Area', 'PJP_Branch', 'PJP_Cluster', 'Nama',
+    'Jabatan', 'No_Kontak', 'NetChange', 'RunningSaldo'
+]
+
+@st.cache_data
+def build_data_query(_client):
+    """Builds the BigQuery query fetching only the table columns the dashboard uses."""
+    table_fields = {field.name: field.field_type for field in _client.get_table(table_id).schema}
+    select_list = []
+    for col in dict.fromkeys(columns_to_display + required_columns):
+        if col not in table_fields:
+            continue
+        if col == 'TransactionDate' and table_fields[col] == 'TIMESTAMP':
+            # Converted to a naive DATETIME server-side instead of stripping the timezone in pandas
+            select_list.append("DATETIME(TransactionDate) AS TransactionDate")
+        else:
+            select_list.append(f"`{col}`")
+
+    return f"""
+SELECT {', '.join(select_list)}
 FROM `{table_id}`
 """
 
+def prepare_data(df_result):
+    """Normalizes the required columns and stores the filter columns as categories."""
+    # BigQuery normally delivers datetime64 already; only parse when it doesn't
+    if not pd.api.types.is_datetime64_any_dtype(df_result['TransactionDate']):
+        df_result['TransactionDate'] = pd.to_datetime(df_result['TransactionDate'], errors='coerce', cache=True)
+
+    # Rupiah amounts are whole numbers; int64 keeps sums exact and unparseable values contribute 0
+    df_result['Amount'] = pd.to_numeric(df_result['Amount'], errors='coerce').fillna(0).round().astype('int64')
+    # Categories keep the sorted unique values once, so option lists and isin work on integer codes.
+    # Labels are converted and placeholders added per category instead of per row.
+    for col in filter_columns:
+        column = df_result[col].astype('category')
+        if col == 'ClusterID':
+            column = column.cat.rename_categories(column.cat.categories.astype(str))
+        if column.isna().any():
+            column = column.cat.add_categories([missing_placeholders[col]]).fillna(missing_placeholders[col])
+        # Numbers sort before the string placeholders when a column mixes both
+        df_result[col] = column.cat.reorder_categories(
+            sorted(column.cat.categories, key=lambda value: (isinstance(value, str), value))
+        )
+
+    # Sorting once here keeps every later date-range selection a contiguous slice. The stable sort keeps
+    # same-timestamp rows in load order, so the running balance is the same on every rerun.
+    return df_result.sort_values('TransactionDate', kind='mergesort', ignore_index=True)
+
+def category_options(column, mask):
+    """Returns the sorted categories of a categorical column that occur in the rows selected by mask."""
+    present = np.zeros(len(column.cat.categories), dtype=bool)
+    present[column.cat.codes.to_numpy()[mask]] = True
+    return column.cat.categories[present].tolist()
+
+def category_mask(column, selected):
+    """Returns the row mask of a categorical column for the selected values, via a lookup table over its codes."""
+    # The trailing False maps missing values (code -1) to unselected
+    lookup = np.append(column.cat.categories.isin(selected), False)
+    return lookup[column.cat.codes.to_numpy()]
+
+@st.cache_data(max_entries=32)
+def apply_filters(_df, data_version, transaction_types, cluster_ids, senders, names, start_date, end_date, saldo_awal):
+    """Returns the filtered rows in chronological order with NetChange and RunningSaldo, cached per selection."""
+    # df is sorted by TransactionDate at load, so the date range (end date inclusive) is one contiguous
+    # slice found by binary search; the category masks are then only evaluated inside that slice
+    transaction_ts = _df['TransactionDate'].to_numpy()
+    start = np.searchsorted(transaction_ts, np.datetime64(start_date), side='left')
+    end = np.searchsorted(transaction_ts, np.datetime64(end_date) + np.timedelta64(1, 'D'), side='left')
+    date_slice = _df.iloc[start:end]
+
+    mask = (category_mask(date_slice['TransactionType'], transaction_types) &
+            category_mask(date_slice['ClusterID'], cluster_ids) &
+            category_mask(date_slice['Sender'], senders) &
+            category_mask(date_slice['Nama'], names))
+
+    # Only the displayed columns are copied out, already in chronological order for the running balance
+    existing_columns = [col for col in columns_to_display if col in _df.columns]
+    df_result = date_slice.loc[mask, existing_columns].reset_index(drop=True)
+
+    # Create a new column 'NetChange' for calculation: the sign per TransactionType category
+    # (+1 Kredit, -1 Debit, 0 otherwise) is gathered by code and applied in one pass over Amount
+    type_categories = df_result['TransactionType'].cat.categories
+    type_signs = np.where(type_categories == 'Kredit', 1, np.where(type_categories == 'Debit', -1, 0))
+    net_change = df_result['Amount'].to_numpy() * type_signs[df_result['TransactionType'].cat.codes.to_numpy()]
+
+    # Calculate the cumulative sum of NetChange on the raw array and add the initial balance in place
+    running_saldo = np.empty_like(net_change)
+    np.cumsum(net_change, out=running_saldo)
+    running_saldo += saldo_awal
+
+    return df_result.assign(NetChange=net_change, RunningSaldo=running_saldo)
+
 @st.cache_data
-def load_data(_client, _query):
-    """Loads data from BigQuery into a Pandas DataFrame."""
+def load_filter_combinations(_df, data_version):
+    """Returns each observed combination of the filter columns with its first and last TransactionDate."""
+    return (
+        _df.groupby(filter_columns, observed=True)['TransactionDate']
+        .agg(FirstDate='min', LastDate='max')
+        .reset_index()
+    )
+
+def clear_session_memos():
+    """Drops this session's memoized filtered frame and download request so they are rebuilt from fresh data."""
+    for key in ('filtered_key', 'filtered_df', 'filtered_excel_key', 'raw_download_key'):
+        st.session_state.pop(key, None)
+
+# Cached as a resource so every rerun and session shares one prepared frame instead of unpickling a
+# copy; callers must treat df as read-only. The load id changes on every load, so the caches keyed on
+# it never serve results from an earlier load, even when the row count and latest date are unchanged.
+@st.cache_resource
+def load_data(_client, _bqstorage_client, _query):
+    """Loads data from BigQuery into a Pandas DataFrame via the BigQuery Storage API, with a per-load id."""
+    load_id = time.time_ns()
     try:
-        query_job = _client.query(_query)
-        df_result = query_job.to_dataframe()
-        return df_result
+        if hasattr(_client, 'query_and_wait'):
+            # jobs.query returns small results inline, so the Storage API is only used for larger ones
+            rows = _client.query_and_wait(_query)
+        else:
+            rows = _client.query(_query).result()
+        # Stream Arrow record batches and let pandas take over the buffers as they are converted
+        arrow_table = rows.to_arrow(bqstorage_client=_bqstorage_client)
+        # INT64 maps to nullable Int64 as in to_dataframe(), so integer columns with NULLs stay integers.
+        # One block per column lets self_destruct release each Arrow buffer as soon as it is converted.
+        df_result = arrow_table.to_pandas(
+            types_mapper={pa.int64(): pd.Int64Dtype()}.get, split_blocks=True, self_destruct=True
+        )
     except Exception as e:
         st.error(f"Error executing BigQuery query: {e}")
-        return pd.DataFrame()
+        return pd.DataFrame(), load_id
+
+    # Preprocess once per load instead of on every rerun
+    if set(required_columns).issubset(df_result.columns):
+        df_result = prepare_data(df_result)
+    return df_result, load_id
+
+# BigQuery query to aggregate the per-cluster summary server-side. It only uses aggregates that
+# BigQuery can derive from the finpay_topup_daily_agg materialized view (sql/), so it is served
+# from the view automatically once that exists.
+summary_query = f"""
+SELECT
+    IFNULL(CAST(ClusterID AS STRING), 'tanpa_cluster') AS ClusterID,
+    TransactionType,
+    MAX(TransactionDate) AS DataUpdate,
+    SUM(SAFE_CAST(Amount AS FLOAT64)) AS Total
+FROM `{table_id}`
+GROUP BY 1, 2
+"""
+
+@st.cache_data
+def load_cluster_summary(_client, _query):
+    """Loads the per-cluster totals aggregated by BigQuery into a Pandas DataFrame."""
+    summary_columns = ['ClusterID', 'Data Update', 'Total Transaksi', 'Total Kredit', 'Total Debit']
+    try:
+        query_job = _client.query(_query)
+        # A few rows per cluster: the REST response is faster than opening a Storage API read session
+        df_result = query_job.to_dataframe(create_bqstorage_client=False)
+    except Exception as e:
+        st.error(f"Error executing BigQuery summary query: {e}")
+        return pd.DataFrame(columns=summary_columns)
+
+    # Fold the (ClusterID, TransactionType) rows into one row per cluster: one groupby for the
+    # cluster-wide values and one pivot for the per-type totals
+    by_cluster = df_result.groupby('ClusterID')
+    totals_by_type = df_result.pivot_table(
+        index='ClusterID', columns='TransactionType', values='Total', aggfunc='sum'
+    ).reindex(columns=['Kredit', 'Debit'])
+    summary_df = pd.DataFrame({
+        'Data Update': pd.to_datetime(by_cluster['DataUpdate'].max()).dt.tz_localize(None),
+        'Total Transaksi': by_cluster['Total'].sum(),
+        'Total Kredit': totals_by_type['Kredit'],
+        'Total Debit': totals_by_type['Debit'],
+    })
+    return summary_df.rename_axis('ClusterID').reset_index()[summary_columns]
+
+# The serializers take the frame unhashed and are keyed on cache_key (data_version or the filter
+# selection), so a cache hit costs a tuple comparison instead of hashing every row
+@st.cache_data(max_entries=32)
+def to_excel_bytes(_frame, cache_key):
+    """Serializes a DataFrame to an Excel workbook, cached so reruns don't rebuild it."""
+    excel_buffer = io.BytesIO()
+    _frame.to_excel(excel_buffer, index=False, engine='xlsxwriter')
+    return excel_buffer.getvalue()
+
+def with_text_categories(frame):
+    """Returns frame with object-typed categories as text, since Arrow needs one type per column."""
+    # Categories mixing numbers and placeholders (e.g. ClusterID and tanpa_cluster) are written as text
+    return frame.assign(**{
+        col: frame[col].cat.rename_categories(frame[col].cat.categories.astype(str))
+        for col in frame.select_dtypes('category')
+        if frame[col].cat.categories.dtype == object
+    })
+
+@st.cache_data(max_entries=32)
+def to_parquet_bytes(_frame, cache_key):
+    """Serializes a DataFrame to Snappy-compressed Parquet, cached so reruns don't rebuild it."""
+    parquet_buffer = io.BytesIO()
+    with_text_categories(_frame).to_parquet(parquet_buffer, engine='pyarrow', compression='snappy', index=False)
+    return parquet_buffer.getvalue()
+
+@st.cache_data(max_entries=32)
+def to_feather_bytes(_frame, cache_key):
+    """Serializes a DataFrame to Zstandard-compressed Arrow Feather, cached so reruns don't rebuild it."""
+    feather_buffer = io.BytesIO()
+    with_text_categories(_frame).to_feather(feather_buffer, compression='zstd')
+    return feather_buffer.getvalue()
+
+# Above this many rows an insert is sent as one Parquet load job instead of streamed
+bulk_load_min_rows = 100
+
+def insert_rows_batched(client, table, rows, chunk_size=500):
+    """Writes rows to a BigQuery table, streaming small batches in chunks of chunk_size, and returns any row errors."""
+    if len(rows) > bulk_load_min_rows:
+        frame = pd.DataFrame(rows)
+        if 'TransactionDate' in frame.columns:
+            frame['TransactionDate'] = pd.to_datetime(frame['TransactionDate'])
+        # Pin the written columns to the table's own types; a failed load job raises from result()
+        job_config = bigquery.LoadJobConfig(
+            schema=[field for field in client.get_table(table).schema if field.name in frame.columns],
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND
+        )
+        client.load_table_from_dataframe(frame, table, job_config=job_config).result()
+        return []
+
+    errors = []
+    for start in range(0, len(rows), chunk_size):
+        chunk_errors = client.insert_rows_json(table, rows[start:start + chunk_size])
+        # Error indexes are relative to the chunk, so shift them back to positions in rows
+        errors.extend({**error, 'index': error['index'] + start} for error in chunk_errors)
+    return errors
+
+def downsample_lttb(x, y, n_out=1000):
+    """Returns the indices kept by Largest-Triangle-Three-Buckets downsampling of (x, y) to n_out points."""
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+
+    # The first and last points are always kept; the rest is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+
+    selected = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        # Keep the point forming the largest triangle with the previous pick and the next bucket's average
+        area = np.abs((x[selected] - avg_x) * (y[start:end] - y[selected]) -
+                      (x[selected] - x[start:end]) * (avg_y - y[selected]))
+        selected = start + int(np.argmax(area))
+        indices[i + 1] = selected
+
+    return indices
 
 # Streamlit App UI
 st.markdown(
@@ -50,67 +335,91 @@ st.markdown(
 
 if st.button("Clear Cache"):
     st.cache_data.clear()
+    load_data.clear()
+    clear_session_memos()
     st.rerun()
 
 # Load data
-df = load_data(client, query)
+try:
+    query = build_data_query(client)
+except Exception as e:
+    st.error(f"Error reading BigQuery table schema: {e}")
+    st.stop()
+
+# data_version identifies this load for the caches that take df unhashed
+df, data_version = load_data(client, bqstorage_client, query)
 
 if df.empty:
     st.warning("No data loaded from BigQuery. Please check the connection and table.")
     st.stop()
 
-# Data preprocessing
-required_columns = ['TransactionDate', 'Amount', 'TransactionType', 'Nama', 'ClusterID', 'Sender']
-if not all(col in df.columns for col in required_columns):
-    st.error(f"Required columns {required_columns} not found in the data.")
+# Data preprocessing happens inside load_data; only validate the result here
+df_columns = frozenset(df.columns)
+missing_columns = [col for col in required_columns if col not in df_columns]
+if missing_columns:
+    st.error(f"Required columns {missing_columns} not found in the data.")
     st.stop()
 
-df['TransactionDate'] = pd.to_datetime(df['TransactionDate'], errors='coerce')
-try:
-    df['TransactionDate'] = df['TransactionDate'].dt.tz_localize(None)
-except TypeError:
-    pass
-
-df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce')
-df['Nama'] = df['Nama'].fillna("tanpa_nama")
-df['TransactionType'] = df['TransactionType'].fillna("tanpa_tipe")
-df['ClusterID'] = df['ClusterID'].fillna("tanpa_cluster").astype(str)
-df['Sender'] = df['Sender'].fillna("tanpa_sender")
-
 # Get latest data update timestamp
 latest_date = df['TransactionDate'].max()
+
 st.info(f"Data Update: {latest_date.strftime('%Y-%m-%d %H:%M:%S')}")
 
 st.write(f"Total Baris data: {len(df)}")
 
-# Define the initial balances based on ClusterID
-initial_balances_by_cluster = {
+# Define the initial balances based on ClusterID, indexed for vectorised lookups
+initial_balances_by_cluster = pd.Series({
     '411311': 33725650,
     '421315': 50622293,
     '421318': 22681438,
     '421320': 52467000,
     '421307': 64689000,
     '421306': 48291500,
-}
+}, dtype='int64')
 
 # ---
 # Raw Data Display (Hidden by Default)
+raw_preview_rows = 5000
 
 with st.expander("Lihat Raw Data"):
-    st.dataframe(df, use_container_width=True)
-
-    # Convert DataFrame to Excel format
-    excel_buffer = io.BytesIO()
-    df.to_excel(excel_buffer, index=False, engine='xlsxwriter')
-    excel_buffer.seek(0)
-    
-    st.download_button(
-        label="Download Data Mentah",
-        data=excel_buffer,
-        file_name='data_finpay_mentah.xlsx',
-        mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        help='Klik untuk mengunduh seluruh data dalam format Excel.'
-    )
+    # Only the first rows are sent to the browser; the download contains everything
+    st.dataframe(df.head(raw_preview_rows), use_container_width=True)
+    if len(df) > raw_preview_rows:
+        st.caption(f"Menampilkan {raw_preview_rows:,} dari {len(df):,} baris. Unduh data untuk melihat seluruhnya.")
+
+    # Feather and Parquet are written by Arrow in a single columnar pass, with Feather as the default.
+    # The full-table file is only built once requested and stays available while the loaded data and
+    # format are unchanged.
+    raw_download_format = st.radio("Format unduhan", ["Feather", "Parquet", "Excel"], horizontal=True)
+    raw_download_key = ('raw', data_version, raw_download_format)
+    if st.session_state.get('raw_download_key') != raw_download_key:
+        if st.button("Siapkan File Unduhan", help='Klik untuk membuat file unduhan dari seluruh data.'):
+            st.session_state['raw_download_key'] = raw_download_key
+    if st.session_state.get('raw_download_key') == raw_download_key:
+        if raw_download_format == "Feather":
+            st.download_button(
+                label="Download Data Mentah",
+                data=to_feather_bytes(df, data_version),
+                file_name='data_finpay_mentah.feather',
+                mime='application/vnd.apache.arrow.file',
+                help='Klik untuk mengunduh seluruh data dalam format Arrow Feather.'
+            )
+        elif raw_download_format == "Parquet":
+            st.download_button(
+                label="Download Data Mentah",
+                data=to_parquet_bytes(df, data_version),
+                file_name='data_finpay_mentah.parquet',
+                mime='application/octet-stream',
+                help='Klik untuk mengunduh seluruh data dalam format Parquet.'
+            )
+        else:
+            st.download_button(
+                label="Download Data Mentah",
+                data=to_excel_bytes(df, data_version),
+                file_name='data_finpay_mentah.xlsx',
+                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                help='Klik untuk mengunduh seluruh data dalam format Excel.'
+            )
 
 # ---
 # Sidebar
@@ -129,7 +438,7 @@ with st.sidebar.expander("Tambah Data Baru"):
         nama = st.text_input("Nama")
         
         # Use unique ClusterIDs from the data for consistency
-        unique_cluster_ids_form = sorted(df['ClusterID'].unique())
+        unique_cluster_ids_form = df['ClusterID'].cat.categories.tolist()
         cluster_id = st.selectbox("Cluster ID", options=unique_cluster_ids_form)
         
         # FIX: Changed to number input to match BigQuery schema
@@ -153,8 +462,8 @@ with st.sidebar.expander("Tambah Data Baru"):
             
             # Insert the new row into the BigQuery table
             try:
-                # BigQuery requires the data as a list of dictionaries
-                errors = client.insert_rows_json(table_id, [new_row])
+                # BigQuery requires the data as a list of dictionaries, sent in recommended-size batches
+                errors = insert_rows_batched(client, table_id, [new_row])
                 
                 if errors:
                     st.error(f"Gagal memasukkan data: {errors}")
@@ -162,62 +471,67 @@ with st.sidebar.expander("Tambah Data Baru"):
                     st.success("Data berhasil dimasukkan ke tabel BigQuery.")
                     st.info("Memperbarui dashboard dengan data terbaru...")
                     st.cache_data.clear()
+                    load_data.clear()
+                    clear_session_memos()
                     st.rerun()
             except Exception as e:
                 st.error(f"Terjadi kesalahan saat memasukkan data ke BigQuery: {e}")
         
 # ---
 # Cascading filters
-# Create a filtered dataframe to be used by all subsequent filters
-filtered_df = df.copy()
+# Options are derived from the cached distinct filter combinations rather than from every row of df;
+# each filter narrows a boolean mask over those combinations
+filter_combinations = load_filter_combinations(df, data_version)
 
 # 1. TransactionType Filter
-unique_transaction_types = sorted(filtered_df['TransactionType'].unique())
+unique_transaction_types = filter_combinations['TransactionType'].cat.categories.tolist()
 selected_transaction_types = st.sidebar.multiselect(
     "1. Filter by Transaction Type",
     options=unique_transaction_types,
     default=unique_transaction_types
 )
 
-# Filter the dataframe based on the first selection
-filtered_df = filtered_df[filtered_df['TransactionType'].isin(selected_transaction_types)]
+# Narrow the mask based on the first selection
+filter_mask = category_mask(filter_combinations['TransactionType'], selected_transaction_types)
 
 # 2. ClusterID Filter (cascading)
-unique_cluster_ids = sorted(filtered_df['ClusterID'].unique())
+unique_cluster_ids = category_options(filter_combinations['ClusterID'], filter_mask)
 selected_cluster_ids = st.sidebar.multiselect(
     "2. Filter by Cluster ID",
     options=unique_cluster_ids,
     default=unique_cluster_ids
 )
 
-# Filter the dataframe based on the second selection
-filtered_df = filtered_df[filtered_df['ClusterID'].isin(selected_cluster_ids)]
+# Narrow the mask based on the second selection
+filter_mask &= category_mask(filter_combinations['ClusterID'], selected_cluster_ids)
 
 # 3. Sender Filter (cascading)
-unique_senders = sorted(filtered_df['Sender'].unique())
+unique_senders = category_options(filter_combinations['Sender'], filter_mask)
 selected_senders = st.sidebar.multiselect(
     "3. Filter by Sender",
     options=unique_senders,
     default=unique_senders
 )
 
-# Filter the dataframe based on the third selection
-filtered_df = filtered_df[filtered_df['Sender'].isin(selected_senders)]
+# Narrow the mask based on the third selection
+filter_mask &= category_mask(filter_combinations['Sender'], selected_senders)
 
 # 4. Name Filter (cascading)
-unique_names = sorted(filtered_df['Nama'].unique())
+unique_names = category_options(filter_combinations['Nama'], filter_mask)
 selected_names = st.sidebar.multiselect(
     "4. Filter by Name",
     options=unique_names,
     default=unique_names
 )
 
-# Filter the dataframe based on the fourth selection
-final_filtered_df = filtered_df[filtered_df['Nama'].isin(selected_names)].copy()
+# Narrow the mask based on the fourth selection
+filter_mask &= category_mask(filter_combinations['Nama'], selected_names)
 
 # Date Filter (applied last for final display)
-min_date = final_filtered_df['TransactionDate'].min().date() if not final_filtered_df.empty and not pd.isna(final_filtered_df['TransactionDate'].min()) else date.today()
-max_date = final_filtered_df['TransactionDate'].max().date() if not final_filtered_df.empty and not pd.isna(final_filtered_df['TransactionDate'].max()) else date.today()
+first_filtered_date = filter_combinations['FirstDate'][filter_mask].min()
+last_filtered_date = filter_combinations['LastDate'][filter_mask].max()
+min_date = first_filtered_date.date() if not pd.isna(first_filtered_date) else date.today()
+max_date = last_filtered_date.date() if not pd.isna(last_filtered_date) else date.today()
 date_range = st.sidebar.date_input(
     "Select Date Range",
     [min_date, max_date],
@@ -227,63 +541,103 @@ date_range = st.sidebar.date_input(
 
 # ---
 # Interactive Scorecards & Filtered Charts
+native_chart_max_days = 30
+
+# Thousands-separated display for amount columns; the browser formats them and the data stays numeric
+amount_column = st.column_config.NumberColumn(format='%,.0f')
+
 col1, col2, col3 = st.columns(3)
 
 if len(date_range) == 2:
     start_date, end_date = date_range
 
     # Calculate the dynamic saldo_awal based on selected ClusterIDs
-    saldo_awal = sum(initial_balances_by_cluster.get(cid, 0) for cid in selected_cluster_ids)
+    saldo_awal = int(initial_balances_by_cluster.reindex(selected_cluster_ids, fill_value=0).sum())
+
+    # Identifies the current selection for the caches keyed on it
+    filter_key = (
+        tuple(selected_transaction_types),
+        tuple(selected_cluster_ids),
+        tuple(selected_senders),
+        tuple(selected_names),
+        start_date,
+        end_date,
+        saldo_awal
+    )
 
-    # Apply date filter on the already-filtered dataframe
-    final_filtered_df = final_filtered_df[(final_filtered_df['TransactionDate'].dt.date >= start_date) & 
-                                         (final_filtered_df['TransactionDate'].dt.date <= end_date)].copy()
+    # Filter and compute the running balance once per unique selection. The session keeps the last
+    # result so reruns from unrelated widgets reuse it without copying it out of the data cache; the
+    # load id in data_version invalidates it in every session once the data is reloaded.
+    if st.session_state.get('filtered_key') != (data_version, filter_key):
+        st.session_state['filtered_df'] = apply_filters(df, data_version, *filter_key)
+        st.session_state['filtered_key'] = (data_version, filter_key)
+    final_filtered_df = st.session_state['filtered_df']
     
-    # Calculate values for scorecards
-    total_debit_filtered = final_filtered_df[final_filtered_df['TransactionType'] == 'Debit']['Amount'].sum()
-    total_kredit_filtered = final_filtered_df[final_filtered_df['TransactionType'] == 'Kredit']['Amount'].sum()
+    # Calculate values for scorecards in a single pass, summing Amount per TransactionType code.
+    # bincount sums its weights as float64 (exact for whole rupiah below 2**53), so cast back to int64.
+    transaction_type_categories = final_filtered_df['TransactionType'].cat.categories
+    totals_by_type = pd.Series(
+        np.bincount(
+            final_filtered_df['TransactionType'].cat.codes.to_numpy(),
+            weights=final_filtered_df['Amount'].to_numpy(),
+            minlength=len(transaction_type_categories)
+        ).round().astype('int64'),
+        index=transaction_type_categories
+    )
+    total_debit_filtered = totals_by_type.get('Debit', 0)
+    total_kredit_filtered = totals_by_type.get('Kredit', 0)
     
     final_balance_value = saldo_awal + (total_kredit_filtered - total_debit_filtered)
 
-    def create_card(title, value):
-        return f"""
-            <div style="
-                background-color: #F0F2F6;
-                padding: 15px; /* Reduced padding */
-                border-radius: 8px; /* Slightly smaller border-radius */
-                box-shadow: 0 4px 6px 0 rgba(0, 0, 0, 0.1); /* Reduced shadow */
-                text-align: center;
-            ">
-                <h5 style="margin: 0; color: #555;">{title}</h5>
-                <h3 style="margin: 5px 0 0; color: #0078A1;">Rp {value:,.0f}</h3>
-            </div>
-        """
-
     with col1:
-        st.markdown(create_card("Total Kredit", total_kredit_filtered), unsafe_allow_html=True)
+        st.metric("Total Kredit", f"Rp {total_kredit_filtered:,.0f}")
 
     with col2:
-        st.markdown(create_card("Total Debit", total_debit_filtered), unsafe_allow_html=True)
+        st.metric("Total Debit", f"Rp {total_debit_filtered:,.0f}")
 
     with col3:
-        st.markdown(create_card("Running Balance", final_balance_value), unsafe_allow_html=True)
+        st.metric("Running Balance", f"Rp {final_balance_value:,.0f}")
 
     st.markdown("<br>", unsafe_allow_html=True) # Menambahkan baris kosong sebagai pemisah
 
     # ---
     ## Daily Debit and Credit Amounts Chart
     if not final_filtered_df['TransactionDate'].dropna().empty:
-        daily_summary = final_filtered_df.groupby([final_filtered_df['TransactionDate'].dt.date, 'TransactionType'])['Amount'].sum().unstack(fill_value=0)
+        # Map each row to its day and sum Amount per day with bincount, separately for each TransactionType
+        day_values = final_filtered_df['TransactionDate'].to_numpy().astype('datetime64[D]')
+        has_day = ~np.isnat(day_values)
+        days, day_index = np.unique(day_values[has_day], return_inverse=True)
+        daily_amounts = final_filtered_df['Amount'].to_numpy()[has_day]
+        daily_type_codes = final_filtered_df['TransactionType'].cat.codes.to_numpy()[has_day]
+        type_categories = final_filtered_df['TransactionType'].cat.categories
+
+        daily_totals = {}
+        for transaction_type in ('Kredit', 'Debit'):
+            if transaction_type in type_categories:
+                is_type = daily_type_codes == type_categories.get_loc(transaction_type)
+                if is_type.any():
+                    daily_totals[transaction_type] = np.bincount(
+                        day_index[is_type], weights=daily_amounts[is_type], minlength=len(days)
+                    ).round().astype('int64')
+        daily_summary = pd.DataFrame(daily_totals, index=pd.DatetimeIndex(days))
         
-        if not daily_summary.empty:
+        if not daily_summary.empty and len(daily_summary) <= native_chart_max_days:
+            # Short ranges use Streamlit's native chart, which skips building and shipping a Plotly figure
+            st.markdown("**Daily Debit and Credit Amounts (Filtered)**")
+            st.line_chart(daily_summary)
+        elif not daily_summary.empty:
             fig = go.Figure()
             
+            # Downsample each trace server-side so long date ranges don't flood the browser
+            daily_x = daily_summary.index.asi8
+            
             # Add a trace for Credit amounts
             if 'Kredit' in daily_summary.columns:
+                kredit_idx = downsample_lttb(daily_x, daily_summary['Kredit'])
                 fig.add_trace(
-                    go.Scatter(
-                        x=daily_summary.index,
-                        y=daily_summary['Kredit'],
+                    go.Scattergl(
+                        x=daily_summary.index[kredit_idx],
+                        y=daily_summary['Kredit'].iloc[kredit_idx],
                         mode='lines+markers',
                         name='Kredit'
                     )
@@ -291,10 +645,11 @@ if len(date_range) == 2:
 
             # Add a trace for Debit amounts
             if 'Debit' in daily_summary.columns:
+                debit_idx = downsample_lttb(daily_x, daily_summary['Debit'])
                 fig.add_trace(
-                    go.Scatter(
-                        x=daily_summary.index,
-                        y=daily_summary['Debit'],
+                    go.Scattergl(
+                        x=daily_summary.index[debit_idx],
+                        y=daily_summary['Debit'].iloc[debit_idx],
                         mode='lines+markers',
                         name='Debit'
                     )
@@ -316,37 +671,6 @@ if len(date_range) == 2:
     if final_filtered_df.empty:
         st.warning("No data found for the selected filters.")
     else:
-        # Sort by date and time to ensure chronological calculation
-        final_filtered_df.sort_values('TransactionDate', ascending=True, inplace=True)
-        
-        # Create a new column 'NetChange' for calculation
-        final_filtered_df['NetChange'] = final_filtered_df.apply(
-            lambda row: row['Amount'] if row['TransactionType'] == 'Kredit' else
-                        -row['Amount'] if row['TransactionType'] == 'Debit' else 0,
-            axis=1
-        )
-        
-        # Calculate the cumulative sum of NetChange and add it to the initial balance
-        final_filtered_df['RunningSaldo'] = saldo_awal + final_filtered_df['NetChange'].cumsum()
-
-        # Reformat numeric columns for display with commas
-        final_filtered_df['Amount'] = final_filtered_df['Amount'].apply(lambda x: f"{x:,.0f}")
-        final_filtered_df['RunningSaldo'] = final_filtered_df['RunningSaldo'].apply(lambda x: f"{x:,.0f}")
-        
-        # List of columns to display, including NetChange and RunningSaldo
-        columns_to_display = [
-            'Remarks', 'Receiver', 'Currency', 'Amount', 'Sender', 'TransactionType',
-            'ClusterID', 'TransactionDate', 'Nama_Manager_Cluster', 'TAP',
-            'Kota_Kabupaten', 'RS_Number', 'Nama_SF', 'nama_outlet', 'SF_Code_2',
-            'SF_Code_1', 'Region', 'cluster_code', 'end_date', 'id_outlet',
-            'start_date', 'PJP_Area', 'PJP_Branch', 'PJP_Cluster', 'Nama',
-            'Jabatan', 'No_Kontak', 'NetChange', 'RunningSaldo'
-        ]
-
-        # Filter the DataFrame to only include the desired columns
-        existing_columns = [col for col in columns_to_display if col in final_filtered_df.columns]
-        final_filtered_df_display = final_filtered_df[existing_columns]
-
         st.markdown(
             """
             <h2 style='text-align: center;'>Filtered Data with Running Balance
@@ -355,23 +679,29 @@ if len(date_range) == 2:
             unsafe_allow_html=True
         )
         # Display the filtered DataFrame with the specified columns and no index
-        st.dataframe(final_filtered_df_display, use_container_width=True)
-        
-        # Download button for filtered data
-        excel_buffer_filtered = io.BytesIO()
-        final_filtered_df_display.to_excel(excel_buffer_filtered, index=False, engine='xlsxwriter')
-        excel_buffer_filtered.seek(0)
-        
-        st.download_button(
-            label="Download Filtered Data",
-            data=excel_buffer_filtered,
-            file_name='data_finpay_filtered.xlsx',
-            mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            help='Klik untuk mengunduh data yang sudah difilter dalam format Excel.'
+        st.dataframe(
+            final_filtered_df,
+            column_config={'Amount': amount_column, 'NetChange': amount_column, 'RunningSaldo': amount_column},
+            use_container_width=True
         )
         
+        # Download button for filtered data. The workbook is only built once requested and stays
+        # available while the selection is unchanged, so filter changes don't pay for xlsxwriter.
+        filtered_excel_key = ('filtered', data_version, filter_key)
+        if st.session_state.get('filtered_excel_key') != filtered_excel_key:
+            if st.button("Siapkan Download Filtered Data", help='Klik untuk membuat file Excel dari data yang sudah difilter.'):
+                st.session_state['filtered_excel_key'] = filtered_excel_key
+        if st.session_state.get('filtered_excel_key') == filtered_excel_key:
+            st.download_button(
+                label="Download Filtered Data",
+                data=to_excel_bytes(final_filtered_df, filtered_excel_key),
+                file_name='data_finpay_filtered.xlsx',
+                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                help='Klik untuk mengunduh data yang sudah difilter dalam format Excel.'
+            )
+        
         final_balance_display = final_filtered_df['RunningSaldo'].iloc[-1]
-        st.markdown(f"**Final Balance: Rp {final_balance_display}**")
+        st.markdown(f"**Final Balance: Rp {final_balance_display:,.0f}**")
 
     # ---
     ## Summary Table of All Clusters
@@ -384,21 +714,8 @@ if len(date_range) == 2:
         unsafe_allow_html=True
     )
 
-    # Create a summary DataFrame
-    summary_df = df.groupby('ClusterID')['Amount'].sum().reset_index()
-    summary_df.rename(columns={'Amount': 'Total Transaksi'}, inplace=True)
-
-    # Separate Debit and Kredit
-    total_kredit_by_cluster = df[df['TransactionType'] == 'Kredit'].groupby('ClusterID')['Amount'].sum()
-    total_debit_by_cluster = df[df['TransactionType'] == 'Debit'].groupby('ClusterID')['Amount'].sum()
-    
-    # Calculate latest transaction date per cluster
-    latest_date_by_cluster = df.groupby('ClusterID')['TransactionDate'].max()
-
-    # Merge into a single summary DataFrame
-    summary_df = summary_df.merge(total_kredit_by_cluster, on='ClusterID', how='left').rename(columns={'Amount': 'Total Kredit'})
-    summary_df = summary_df.merge(total_debit_by_cluster, on='ClusterID', how='left').rename(columns={'Amount': 'Total Debit'})
-    summary_df = summary_df.merge(latest_date_by_cluster, on='ClusterID', how='left').rename(columns={'TransactionDate': 'Data Update'})
+    # Create a summary DataFrame (totals and latest transaction date per cluster are aggregated by BigQuery)
+    summary_df = load_cluster_summary(client, summary_query)
 
     # Fill NaN with 0 for clusters with no credit or debit transactions
     summary_df[['Total Kredit', 'Total Debit']] = summary_df[['Total Kredit', 'Total Debit']].fillna(0)
@@ -407,41 +724,31 @@ if len(date_range) == 2:
     summary_df['Initial Balance'] = summary_df['ClusterID'].map(initial_balances_by_cluster).fillna(0)
     summary_df['Running Balance'] = summary_df['Initial Balance'] + summary_df['Total Kredit'] - summary_df['Total Debit']
     
-    # Calculate the grand total of the running balances
-    total_running_balance = summary_df['Running Balance'].sum()
-
-    # Add a summary row at the bottom of the dataframe
-    summary_row = pd.DataFrame([['Total',
-                                 '---', # Data Update for total row
-                                 summary_df['Total Transaksi'].sum(),
-                                 summary_df['Total Kredit'].sum(),
-                                 summary_df['Total Debit'].sum(),
-                                 summary_df['Initial Balance'].sum(),
-                                 total_running_balance]],
-                               columns=['ClusterID', 'Data Update', 'Total Transaksi', 'Total Kredit', 'Total Debit', 'Initial Balance', 'Running Balance'])
-    
-    summary_df = pd.concat([summary_df, summary_row], ignore_index=True)
-
-    # Reformat numeric and datetime columns for display
-    summary_df['Data Update'] = summary_df['Data Update'].apply(lambda x: x.strftime('%Y-%m-%d %H:%M:%S') if pd.notnull(x) and x != '---' else '---')
-    summary_df['Total Transaksi'] = summary_df['Total Transaksi'].apply(lambda x: f"{x:,.0f}")
-    summary_df['Total Kredit'] = summary_df['Total Kredit'].apply(lambda x: f"{x:,.0f}")
-    summary_df['Total Debit'] = summary_df['Total Debit'].apply(lambda x: f"{x:,.0f}")
-    summary_df['Initial Balance'] = summary_df['Initial Balance'].apply(lambda x: f"{x:,.0f}")
-    summary_df['Running Balance'] = summary_df['Running Balance'].apply(lambda x: f"{x:,.0f}")
-
     # Reorder columns for better readability
     summary_df = summary_df[['ClusterID', 'Data Update', 'Total Kredit', 'Total Debit', 'Initial Balance', 'Running Balance']]
 
-    st.dataframe(summary_df, use_container_width=True)
+    st.dataframe(
+        summary_df,
+        column_config={
+            'Data Update': st.column_config.DatetimeColumn(format='YYYY-MM-DD HH:mm:ss'),
+            **{col: amount_column for col in ['Total Kredit', 'Total Debit', 'Initial Balance', 'Running Balance']}
+        },
+        use_container_width=True
+    )
+
+    # The grand totals are shown below the table rather than appended as a row, so every column keeps its dtype
+    summary_totals = summary_df[['Total Kredit', 'Total Debit', 'Initial Balance', 'Running Balance']].sum()
+    st.markdown(
+        f"**Total Kredit: Rp {summary_totals['Total Kredit']:,.0f} | "
+        f"Total Debit: Rp {summary_totals['Total Debit']:,.0f} | "
+        f"Initial Balance: Rp {summary_totals['Initial Balance']:,.0f} | "
+        f"Total Running Balance: Rp {summary_totals['Running Balance']:,.0f}**"
+    )
 
     # Download button for the summary table
-    summary_excel_buffer = io.BytesIO()
-    summary_df.to_excel(summary_excel_buffer, index=False, engine='xlsxwriter')
-    summary_excel_buffer.seek(0)
     st.download_button(
         label="Download Ringkasan Klaster",
-        data=summary_excel_buffer,
+        data=to_excel_bytes(summary_df, ('summary', data_version)),
         file_name='ringkasan_klaster.xlsx',
         mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
         help='Klik untuk mengunduh ringkasan saldo klaster dalam format Excel.'
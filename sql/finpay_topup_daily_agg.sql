@@ -0,0 +1,18 @@
+-- Daily aggregates of finpay_topup_joined per cluster, transaction type, sender and name.
+-- The dashboard's cluster summary query (summary_query in App.py) only uses aggregates that
+-- can be rolled up from this view, so BigQuery answers it from the view instead of scanning
+-- the base table once the view exists.
+CREATE MATERIALIZED VIEW IF NOT EXISTS `alfred-analytics-406004.analytics_alfred.finpay_topup_daily_agg`
+OPTIONS (enable_refresh = true, refresh_interval_minutes = 30)
+AS
+SELECT
+    DATE(TransactionDate) AS TransactionDay,
+    ClusterID,
+    TransactionType,
+    Sender,
+    Nama,
+    MAX(TransactionDate) AS LastTransactionDate,
+    SUM(SAFE_CAST(Amount AS FLOAT64)) AS Amount,
+    COUNT(*) AS Transactions
+FROM `alfred-analytics-406004.analytics_alfred.finpay_topup_joined`
+GROUP BY TransactionDay, ClusterID, TransactionType, Sender, Nama;